@@ -1,10 +1,14 @@
+import argparse
+import ipaddress
 import json
-import networkx as nx
-import matplotlib.pyplot as plt
-import httplib2
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from datetime import timedelta
 
+# networkx, matplotlib and httplib2 are slow to import, so they are only
+# imported inside the code paths that use them. A stats run never loads them.
+if TYPE_CHECKING:
+    import networkx as nx
+
 
 class NetworkDataRetriever:
     """Handles retrieval of network data from OpenDaylight controller"""
@@ -13,6 +17,8 @@ class NetworkDataRetriever:
         self.odl_host = odl_host
         self.odl_port = odl_port
         self.base_url = f"http://{odl_host}:{odl_port}/rests"
+        import httplib2
+
         self.http = httplib2.Http(".cache")
         self.http.add_credentials(name="admin", password="admin")
 
@@ -130,6 +136,11 @@ class BGPAnalyser:
                                                     "local-pref"
                                                 ].get("pref", 0)
 
+                                            if "multi-exit-disc" in attrs:
+                                                route_info["med"] = attrs[
+                                                    "multi-exit-disc"
+                                                ].get("med", 0)
+
                                             if "as-path" in attrs:
                                                 route_info["as_path"] = attrs["as-path"]
 
@@ -174,15 +185,128 @@ class BGPAnalyser:
         return stats
 
 
+class RouteAggregator:
+    """Summarises received routes exactly: merges equal-attribute siblings into
+    their supernet and removes prefixes covered by an identical route"""
+
+    # Route fields that are not attributes; everything else must match to merge
+    NON_ATTRIBUTES = ("prefix", "path_id")
+
+    def __init__(self, routes: List[Dict]):
+        self.routes = routes
+        self.aggregated = []
+
+    def _attribute_key(self, route: Dict) -> str:
+        """Hashable view of everything about a route except its prefix"""
+        attributes = {k: v for k, v in route.items() if k not in self.NON_ATTRIBUTES}
+        return json.dumps(attributes, sort_keys=True)
+
+    @staticmethod
+    def _remove_covered(prefixes: Dict[Tuple[int, int], Tuple[str, ...]]) -> None:
+        """Drop prefixes whose closest covering prefix has the same attributes
+
+        Sorting by (network, length) puts every prefix straight after the
+        prefixes covering it, so a stack of open supernets gives each prefix
+        its closest parent in one pass.
+        """
+        stack = []
+        covered = []
+        for network, length in sorted(prefixes):
+            while stack:
+                parent_network, parent_length = stack[-1]
+                mask = (0xFFFFFFFF << (32 - parent_length)) & 0xFFFFFFFF
+                if parent_length < length and network & mask == parent_network:
+                    break
+                stack.pop()
+            if stack and prefixes[stack[-1]] == prefixes[(network, length)]:
+                covered.append((network, length))
+            stack.append((network, length))
+        for prefix in covered:
+            del prefixes[prefix]
+
+    @staticmethod
+    def _merge_siblings(prefixes: Dict[Tuple[int, int], Tuple[str, ...]]) -> None:
+        """Merge sibling prefixes with equal attributes into their supernet
+
+        Works from the longest prefixes up so merged supernets can merge again.
+        A merge is skipped when the supernet already exists with other
+        attributes, since replacing it would change forwarding.
+        """
+        by_length = {}
+        for network, length in prefixes:
+            by_length.setdefault(length, set()).add(network)
+
+        for length in range(32, 0, -1):
+            size = 1 << (32 - length)
+            for network in sorted(by_length.get(length, ())):
+                if network & size:
+                    continue  # Handle each pair from its lower half
+                sibling = network | size
+                key = prefixes.get((network, length))
+                if key is None or prefixes.get((sibling, length)) != key:
+                    continue
+                supernet = (network, length - 1)
+                if prefixes.get(supernet, key) != key:
+                    continue
+                del prefixes[(network, length)]
+                del prefixes[(sibling, length)]
+                prefixes[supernet] = key
+                by_length.setdefault(length - 1, set()).add(network)
+
+    def aggregate(self) -> List[Dict]:
+        """Aggregate IPv4 routes, anything else is passed through untouched"""
+        prefixes = {}
+        passthrough = []
+        for route in self.routes:
+            try:
+                network = ipaddress.IPv4Network(route.get("prefix", ""))
+            except ValueError:
+                passthrough.append(route)
+                continue
+            prefix = (int(network.network_address), network.prefixlen)
+            # With several paths for one prefix, the whole path set must match
+            paths = set(prefixes.get(prefix, ()))
+            paths.add(self._attribute_key(route))
+            prefixes[prefix] = tuple(sorted(paths))
+
+        self._remove_covered(prefixes)
+        self._merge_siblings(prefixes)
+        self._remove_covered(prefixes)
+
+        aggregated = []
+        for (network, length), paths in sorted(prefixes.items()):
+            prefix = f"{ipaddress.IPv4Address(network)}/{length}"
+            for attributes in paths:
+                aggregated.append({"prefix": prefix, **json.loads(attributes)})
+
+        self.aggregated = aggregated + passthrough
+        return self.aggregated
+
+    def calculate_compression(self) -> Dict:
+        """Compare the received routes with the aggregated ones"""
+        original = len(self.routes)
+        aggregated = len(self.aggregated)
+        return {
+            "original_routes": original,
+            "aggregated_routes": aggregated,
+            "compression_ratio": original / aggregated if aggregated else 0.0,
+            "reduction_percent": (
+                100.0 * (original - aggregated) / original if original else 0.0
+            ),
+        }
+
+
 class NetworkVisualiser:
     """Handles network topology visualisation and analysis"""
 
     def __init__(self, routes: List[Dict]):
+        import networkx as nx
+
         self.routes = routes
         self.graph = nx.Graph()
         self.interface_map = {}
 
-    def build_topology(self) -> nx.Graph:
+    def build_topology(self) -> "nx.Graph":
         """Build network topology graph from route data"""
         # Extract point-to-point networks
         networks = []
@@ -218,6 +342,8 @@ class NetworkVisualiser:
 
     def calculate_network_metrics(self) -> Dict:
         """Calculate graph-based network metrics"""
+        import networkx as nx
+
         if not self.graph or self.graph.number_of_nodes() == 0:
             return {}
 
@@ -240,12 +366,22 @@ class NetworkVisualiser:
 
         return metrics
 
-    def visualise_topology(self, output_file: str = "223146145_topology.png"):
+    def visualise_topology(
+        self, output_file: str = "223146145_topology.png", show: bool = True
+    ):
         """Generate and save network topology visualisation"""
         if not self.graph or self.graph.number_of_nodes() == 0:
             print("No topology data to visualise")
             return
 
+        import matplotlib
+
+        if not show:
+            # Headless runs only save the file, no GUI backend is needed
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
         plt.figure(figsize=(12, 8))
         position = nx.spring_layout(self.graph, seed=42, k=2)
 
@@ -278,7 +414,9 @@ class NetworkVisualiser:
         plt.tight_layout()
         plt.savefig(output_file, dpi=300, bbox_inches="tight")
         print(f"\nTopology diagram saved to: {output_file}")
-        plt.show()
+        if show:
+            plt.show()
+        plt.close()
 
 
 class OutputFormatter:
@@ -394,6 +532,37 @@ class OutputFormatter:
         for ptype, count in prefix_types.items():
             print(f"  {ptype.replace('_', ' ').title():20} {count}")
 
+    @staticmethod
+    def display_aggregation(
+        aggregated: List[Dict], compression: Dict, show_routes: bool = True
+    ):
+        """Display how much aggregation shrinks the RIB, and optionally the routes"""
+        OutputFormatter.print_header("ROUTE AGGREGATION")
+
+        if not aggregated:
+            print("No routes to aggregate.")
+            return
+
+        original = compression.get("original_routes", 0)
+        remaining = compression.get("aggregated_routes", 0)
+        ratio = compression.get("compression_ratio", 0)
+        reduction = compression.get("reduction_percent", 0)
+        print(f"\nAggregation Summary:")
+        print(f"  Routes Received:              {original}")
+        print(f"  Routes After Aggregation:     {remaining}")
+        print(f"  Compression Ratio:            {ratio:.2f}x")
+        print(f"  Reduction:                    {reduction:.1f}%")
+
+        if not show_routes:
+            return
+
+        OutputFormatter.print_subheader("Aggregated Routes")
+        for route in aggregated:
+            print(f"\n  Prefix:            {route.get('prefix')}")
+            print(f"    Next Hop:        {route.get('next_hop', 'N/A')}")
+            print(f"    Origin:          {route.get('origin', 'N/A')}")
+            print(f"    Local Pref:      {route.get('local_pref', 'N/A')}")
+
     @staticmethod
     def display_network_metrics(metrics: Dict):
         """Display network topology metrics"""
@@ -425,8 +594,8 @@ class OutputFormatter:
             print(f"  Network has poor redundancy (tree topology)")
 
 
-def main():
-    """Main application execution"""
+def run_full_analysis():
+    """Fetch, analyse, report and render in one go"""
     print("\n" + "=" * 80)
     print(" OPENDAYLIGHT SDN NETWORK ANALYSIS APPLICATION")
     print(" Student ID: 223146145")
@@ -452,6 +621,9 @@ def main():
     peers = analyser.extract_peer_information()
     routes = analyser.extract_route_information()
     statistics = analyser.calculate_statistics()
+    aggregator = RouteAggregator(routes)
+    aggregated_routes = aggregator.aggregate()
+    compression = aggregator.calculate_compression()
     print(f"      Found {len(peers)} BGP peer(s) and {len(routes)} route(s)")
 
     # Step 3: Build and analyse topology
@@ -469,6 +641,7 @@ def main():
     OutputFormatter.display_bgp_neighbours(peers)
     OutputFormatter.display_routing_information(routes)
     OutputFormatter.display_statistics(statistics)
+    OutputFormatter.display_aggregation(aggregated_routes, compression)
     OutputFormatter.display_network_metrics(network_metrics)
 
     # Step 5: Generate visualisation
@@ -490,5 +663,147 @@ def main():
     print("=" * 80 + "\n")
 
 
+def load_bgp_data(input_file: str) -> dict:
+    """Load BGP RIB data previously saved by the fetch command"""
+    try:
+        with open(input_file, "r", encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading BGP data from {input_file}: {e}")
+        return {}
+
+
+def build_visualiser(bgp_data: dict) -> NetworkVisualiser:
+    """Build the topology from the routes in the BGP data"""
+    routes = BGPAnalyser(bgp_data).extract_route_information()
+    visualiser = NetworkVisualiser(routes)
+    visualiser.build_topology()
+    return visualiser
+
+
+def command_fetch(args) -> int:
+    """Retrieve the BGP RIB from the controller and save it"""
+    retriever = NetworkDataRetriever(args.host, args.port)
+    bgp_data = retriever.get_bgp_rib_data(args.rib)
+    if not bgp_data:
+        print("Failed to retrieve BGP data from controller.")
+        return 1
+
+    with open(args.output, "w", encoding="utf8") as f:
+        json.dump(bgp_data, f, indent=4, ensure_ascii=False)
+    print(f"Raw network data saved to: {args.output}")
+    return 0
+
+
+def command_stats(args) -> int:
+    """Report BGP neighbours, routes, statistics and aggregation"""
+    bgp_data = load_bgp_data(args.input)
+    if not bgp_data:
+        return 1
+
+    analyser = BGPAnalyser(bgp_data)
+    peers = analyser.extract_peer_information()
+    routes = analyser.extract_route_information()
+    statistics = analyser.calculate_statistics()
+    aggregator = RouteAggregator(routes)
+    aggregated_routes = aggregator.aggregate()
+
+    if args.verbose:
+        OutputFormatter.display_bgp_neighbours(peers)
+        OutputFormatter.display_routing_information(routes)
+    OutputFormatter.display_statistics(statistics)
+    OutputFormatter.display_aggregation(
+        aggregated_routes, aggregator.calculate_compression(), args.verbose
+    )
+    return 0
+
+
+def command_topology(args) -> int:
+    """Report graph metrics of the topology"""
+    bgp_data = load_bgp_data(args.input)
+    if not bgp_data:
+        return 1
+
+    visualiser = build_visualiser(bgp_data)
+    OutputFormatter.display_network_metrics(visualiser.calculate_network_metrics())
+    return 0
+
+
+def command_render(args) -> int:
+    """Draw the topology and save it as an image"""
+    bgp_data = load_bgp_data(args.input)
+    if not bgp_data:
+        return 1
+
+    visualiser = build_visualiser(bgp_data)
+    visualiser.visualise_topology(args.output, show=args.show)
+    return 0
+
+
+def command_warm_cache(args) -> int:
+    """Build the matplotlib font cache ahead of the first render"""
+    import matplotlib
+    from matplotlib import font_manager
+
+    font_manager.findfont("DejaVu Sans")
+    print(f"Font cache ready in: {matplotlib.get_cachedir()}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line interface, one subcommand per stage of the analysis"""
+    parser = argparse.ArgumentParser(
+        description="OpenDaylight SDN network analysis. "
+        "Without a command, runs the whole analysis."
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    fetch = commands.add_parser("fetch", help=command_fetch.__doc__)
+    fetch.add_argument("--host", default="192.168.56.104")
+    fetch.add_argument("--port", default="8181")
+    fetch.add_argument("--rib", default="bgp-to-r1")
+    fetch.add_argument("--output", default="network_data.json")
+    fetch.set_defaults(handler=command_fetch)
+
+    stats = commands.add_parser("stats", help=command_stats.__doc__)
+    stats.add_argument("--input", default="network_data.json")
+    stats.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Also list peers, routes and aggregated routes",
+    )
+    stats.set_defaults(handler=command_stats)
+
+    topology = commands.add_parser("topology", help=command_topology.__doc__)
+    topology.add_argument("--input", default="network_data.json")
+    topology.set_defaults(handler=command_topology)
+
+    render = commands.add_parser("render", help=command_render.__doc__)
+    render.add_argument("--input", default="network_data.json")
+    render.add_argument("--output", default="223146145_topology.png")
+    render.add_argument(
+        "--no-show",
+        dest="show",
+        action="store_false",
+        help="Only save the image, do not open a window",
+    )
+    render.set_defaults(handler=command_render)
+
+    warm_cache = commands.add_parser("warm-cache", help=command_warm_cache.__doc__)
+    warm_cache.set_defaults(handler=command_warm_cache)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main application execution"""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        run_full_analysis()
+        return 0
+    return args.handler(args)
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+"""
+Checks for traffic.py. Run with python test_traffic.py (or pytest).
+"""
+
+import networkx as nx
+import numpy as np
+
+from traffic import TrafficSimulator
+
+
+def test_demand_conserved_with_large_costs():
+    """Large OSPF-style costs next to cheap links must not add extra next hops
+
+    With t-a and t-b at cost 200000 and a-b at cost 1, a and b sit at nearly
+    the same distance from t. Only a->t is on the shortest path from s, so the
+    single unit sent from s must arrive at t in full over s->a and a->t.
+    """
+    Graph = nx.Graph()
+    Graph.add_weighted_edges_from(
+        [("t", "a", 200000), ("t", "b", 200000), ("a", "b", 1), ("s", "a", 1)]
+    )
+    simulator = TrafficSimulator(Graph)
+    demand = np.zeros((4, 4))
+    demand[simulator.index["s"], simulator.index["t"]] = 1.0
+    result = simulator.simulate(demand)
+
+    loads = {
+        (simulator.nodes[tail], simulator.nodes[head]): float(load)
+        for tail, head, load in zip(
+            simulator.tails, simulator.heads, result["link_loads"]
+        )
+    }
+    expected = {("s", "a"): 1.0, ("a", "t"): 1.0}
+    unexpected = {
+        link: load
+        for link, load in loads.items()
+        if load != expected.get(link, 0.0)
+    }
+    if result["routed_demand"] != 1.0 or unexpected:
+        raise AssertionError(
+            f"Expected 1.0 routed over s->a->t only, got routed "
+            f"{result['routed_demand']} and link loads {unexpected}"
+        )
+
+
+if __name__ == "__main__":
+    test_demand_conserved_with_large_costs()
+    print("All traffic checks passed")
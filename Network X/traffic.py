@@ -0,0 +1,219 @@
+"""
+Capacity planning for the router topology: route a whole traffic matrix over the
+shortest paths (splitting equally over equal-cost next hops, like OSPF ECMP) and
+find out which links end up carrying the most traffic.
+
+Instead of calling nx.shortest_path for every router pair, the graph is turned
+into a sparse matrix, one all-pairs Dijkstra run gives every SPF tree, and each
+destination's traffic is pushed down its shortest-path DAG with a sparse solve.
+"""
+
+from typing import Dict, List, Tuple
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import spsolve_triangular
+
+
+def uniform_traffic_matrix(routers: int, demand: float = 1.0) -> np.ndarray:
+    """Full-mesh traffic matrix with the same demand between every router pair"""
+    matrix = np.full((routers, routers), demand, dtype=float)
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+class TrafficSimulator:
+    """Routes traffic matrices over a weighted graph and accumulates link loads"""
+
+    def __init__(
+        self, graph: nx.Graph, weight: str = "weight", capacity: str = "capacity"
+    ):
+        self.graph = graph
+        self.nodes = list(graph.nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+        for u, v, w in graph.edges(data=weight, default=1):
+            if w <= 0:
+                raise ValueError(f"Link {u}-{v} has non-positive weight {w}")
+
+        # Every directed link is one entry of the sparse adjacency matrix.
+        # An undirected graph gives both directions, which are loaded separately.
+        self.adjacency = nx.to_scipy_sparse_array(
+            graph, nodelist=self.nodes, weight=weight, format="csr"
+        )
+        links = self.adjacency.tocoo()
+        self.tails = links.row
+        self.heads = links.col
+        self.lengths = links.data
+
+        # Integer costs (the OSPF case) sum exactly, so next hops can be found
+        # by exact comparison. Otherwise allow rounding far below any link cost.
+        if np.all(self.lengths == np.round(self.lengths)):
+            self.tolerance = 0.0
+        else:
+            self.tolerance = 1e-9 * self.lengths.min()
+
+        # Capacities are optional, links without one get no utilisation figure
+        position = {
+            (tail, head): i
+            for i, (tail, head) in enumerate(zip(self.tails, self.heads))
+        }
+        self.capacities = np.full(len(self.lengths), np.nan)
+        for u, v, cap in graph.edges(data=capacity, default=None):
+            if cap is None:
+                continue
+            i, j = self.index[u], self.index[v]
+            self.capacities[position[(i, j)]] = cap
+            if not graph.is_directed():
+                self.capacities[position[(j, i)]] = cap
+
+        self._distances = None
+
+    def shortest_path_distances(self) -> np.ndarray:
+        """All-pairs SPF distances, computed once and reused for every matrix"""
+        if self._distances is None:
+            self._distances = csgraph.dijkstra(self.adjacency, directed=True)
+        return self._distances
+
+    def _load_towards(
+        self, destinations: np.ndarray, demand: np.ndarray, loads: np.ndarray
+    ) -> float:
+        """Push demand for a batch of destinations down their SPF DAGs
+
+        Column j of demand holds the traffic every router sends to
+        destinations[j]. Link loads are added in place, the demand that
+        arrives at its destination is returned.
+        """
+        routers, batch = demand.shape
+        columns = np.arange(batch)
+        distance = self.shortest_path_distances()[:, destinations]
+
+        demand[~np.isfinite(distance)] = 0.0
+        demand[destinations, columns] = 0.0
+
+        # A link u->v is on a shortest path to the destination when
+        # dist(u) == w(u, v) + dist(v); those links form the ECMP DAG.
+        # Requiring dist(u) > dist(v) keeps it acyclic whatever the rounding.
+        tail_distance = distance[self.tails]
+        head_distance = distance[self.heads]
+        # Links whose head cannot reach the destination are never on the DAG,
+        # so only compare distances where both ends are finite.
+        reachable = np.isfinite(tail_distance) & np.isfinite(head_distance)
+        slack = np.full(tail_distance.shape, np.inf)
+        np.subtract(
+            tail_distance,
+            self.lengths[:, None] + head_distance,
+            out=slack,
+            where=reachable,
+        )
+        on_dag = (
+            reachable
+            & (tail_distance > head_distance)
+            & (np.abs(slack) <= self.tolerance)
+        )
+        link, column = np.nonzero(on_dag)
+        dag_tails = self.tails[link]
+        dag_heads = self.heads[link]
+
+        # Each router splits what it forwards equally over its next hops
+        next_hops = np.bincount(
+            column * routers + dag_tails, minlength=routers * batch
+        )
+        share = 1.0 / next_hops[column * routers + dag_tails]
+
+        # Traffic through a router is its own demand plus everything forwarded
+        # to it: x = d + P^T x, so solve (I - P^T) x = d. Numbering routers
+        # from farthest to nearest makes each destination's system lower
+        # triangular, and the whole batch is solved as one block diagonal.
+        order = np.argsort(-distance, axis=0, kind="stable")
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(routers)[:, None], axis=0)
+        rank += columns * routers
+        size = routers * batch
+        system = sparse.csr_array(
+            (
+                np.concatenate((np.ones(size), -share)),
+                (
+                    np.concatenate((np.arange(size), rank[dag_heads, column])),
+                    np.concatenate((np.arange(size), rank[dag_tails, column])),
+                ),
+            ),
+            shape=(size, size),
+        )
+        ordered_demand = np.empty(size)
+        ordered_demand[rank] = demand
+        through = spsolve_triangular(system, ordered_demand, lower=True)[rank]
+
+        carried = through[dag_tails, column] * share
+        loads += np.bincount(link, weights=carried, minlength=len(loads))
+        # Only what actually reaches the destination counts as routed
+        return float(carried[dag_heads == destinations[column]].sum())
+
+    def simulate(self, traffic_matrix, batch: int = 128) -> Dict:
+        """Route a traffic matrix (rows are sources, columns are destinations)"""
+        routers = len(self.nodes)
+        matrix = sparse.csc_array(traffic_matrix, dtype=float)
+        if matrix.shape != (routers, routers):
+            raise ValueError(
+                f"Traffic matrix is {matrix.shape}, expected ({routers}, {routers})"
+            )
+
+        # Only destinations that something is sent to need routing
+        matrix.eliminate_zeros()
+        wanted = np.flatnonzero(np.diff(matrix.indptr))
+
+        loads = np.zeros(len(self.lengths))
+        routed = 0.0
+        for first in range(0, len(wanted), batch):
+            destinations = wanted[first : first + batch]
+            demand = matrix[:, destinations].toarray()
+            routed += self._load_towards(destinations, demand, loads)
+
+        total = float(matrix.sum() - matrix.diagonal().sum())
+        return {
+            "link_loads": loads,
+            "utilisation": loads / self.capacities,
+            "total_demand": total,
+            "routed_demand": routed,
+            "unrouted_demand": total - routed,
+        }
+
+    def hottest_links(
+        self, result: Dict, top: int = 10
+    ) -> List[Tuple[object, object, float, float]]:
+        """The most loaded links as (from, to, load, utilisation), busiest first"""
+        loads = result["link_loads"]
+        utilisation = result["utilisation"]
+        # Rank by utilisation when capacities are known, otherwise by raw load.
+        # Links without a capacity sort after those that have one.
+        if np.isnan(utilisation).all():
+            key = loads
+        else:
+            key = np.where(np.isnan(utilisation), -np.inf, utilisation)
+        order = np.argsort(key, kind="stable")[::-1][:top]
+        return [
+            (
+                self.nodes[self.tails[i]],
+                self.nodes[self.heads[i]],
+                float(loads[i]),
+                float(utilisation[i]),
+            )
+            for i in order
+        ]
+
+
+if __name__ == "__main__":
+    # Same lab topology as Main.py, with one unit of traffic between every pair
+    Graph = nx.Graph()
+    Graph.add_nodes_from(range(6))
+    edges = [(0, 2, 4), (1, 3, 3), (2, 5, 10), (4, 1, 8), (5, 4, 2), (0, 4, 1), (0, 5, 10)]
+    Graph.add_weighted_edges_from(edges)
+
+    simulator = TrafficSimulator(Graph)
+    result = simulator.simulate(uniform_traffic_matrix(Graph.number_of_nodes()))
+    print(f"Routed {result['routed_demand']} of {result['total_demand']} units")
+    for u, v, load, _ in simulator.hottest_links(result, top=5):
+        print(f"  {u} -> {v}: {load:.2f}")
+
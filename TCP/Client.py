@@ -1,14 +1,26 @@
+import os
 import socket
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
 
 host = '192.168.24.87'# IP adress of the server
 port = 9999# The port of the server
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as Client:
-    Client.connect((host, port))
-    message = f'Sam is saying Hi'
-    Client.sendall((message.encode('utf-8'))) # Send a message to the Server
-    data = Client.recv(1024)
-    if  data:
-        decoded_message = data.decode('utf-8')
-        print(f'The Server sent back the message {decoded_message}')
-
+try:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as Client:
+        Client.connect((host, port))
+        reader = codec.FrameReader(Client)
+        compression = codec.offer_compression(Client, reader) # Agree on compression first
+        message = f'Sam is saying Hi'
+        codec.send_frame(Client, [codec.UTF8.encode(message)], codec.UTF8, compression) # Send a message to the Server
+        frame = reader.read()
+        if  frame:
+            message_codec, _, payload = frame
+            decoded_message = message_codec.decode(payload)
+            print(f'The Server sent back the message {decoded_message}')
+except socket.error as e:
+    print(f'error occured: {e}.')
+except codec.FrameError as e:
+    print(f'The server sent a bad frame: {e}.')
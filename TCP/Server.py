@@ -1,23 +1,154 @@
+import os
+import queue
 import socket
+import sys
 import threading
 import time # Import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
+
 host = '127.0.0.1'
 port = 9999
 
-def handle_client(client_socket, address):
+max_connections = 8 # Clients being served at the same time
+max_queued = 16 # Clients allowed to wait for a free slot, the rest are turned away
+queue_timeout = 10.0 # Seconds a client may wait in the queue before it is dropped
+idle_timeout = 30.0 # Seconds without any data before a client is disconnected
+read_timeout = 5.0 # Seconds a single recv/send may block, also mid-message
+frame_timeout = 15.0 # Seconds a whole message may take to arrive once it has started
+buffer_size = 64 * 1024 # Caps the kernel socket buffers of each client
+max_frame_size = 1024 * 1024 # Largest message a client may send, caps its read buffer
+drain_timeout = 10.0 # Seconds to let busy clients finish when shutting down
+response_prefix = b'Server Received: '
+
+
+class ConnectionManager:
+    """Admits clients into a fixed pool of worker threads and keeps live counters."""
+
+    def __init__(self):
+        self.pending = queue.Queue(maxsize=max_queued)
+        self.shutdown = threading.Event()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.workers = [
+            threading.Thread(target=self.worker, name=f'worker-{i}', daemon=True)
+            for i in range(max_connections)
+        ]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stats(self):
+        """Snapshot of the live connection counters."""
+        with self.lock:
+            return {
+                'active': self.active,
+                'queued': self.pending.qsize(),
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+    def admit(self, client_socket, address):
+        """Queue a new client for a worker, or reject it when the queue is full."""
+        try:
+            self.pending.put_nowait((client_socket, address, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            print(f'Rejecting {address}: server is full {self.stats()}')
+            try:
+                codec.send_frame(client_socket, [b'Server busy, try again later'], codec.UTF8)
+            except socket.error:
+                pass
+            client_socket.close()
+            return
+        with self.lock:
+            self.accepted += 1
+        print(f'Admitted {address} {self.stats()}')
+
+    def worker(self):
+        """Serve queued clients one at a time until the server shuts down."""
+        while not self.shutdown.is_set():
+            try:
+                client_socket, address, queued_at = self.pending.get(timeout=read_timeout)
+            except queue.Empty:
+                continue
+
+            if time.monotonic() - queued_at > queue_timeout:
+                print(f'Client {address} waited too long in the queue')
+                with self.lock:
+                    self.timed_out += 1
+                client_socket.close()
+                continue
+
+            with self.lock:
+                self.active += 1
+            try:
+                handle_client(client_socket, address, self)
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+    def drain(self):
+        """Stop taking work, close waiting clients and wait for busy ones."""
+        self.shutdown.set()
+        while True:
+            try:
+                client_socket, address, _ = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            print(f'Closing queued client {address}')
+            client_socket.close()
+
+        deadline = time.monotonic() + drain_timeout
+        for worker in self.workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+        still_busy = sum(worker.is_alive() for worker in self.workers)
+        if still_busy:
+            print(f'{still_busy} client(s) still busy after {drain_timeout}s, abandoning them')
+
+
+def handle_client(client_socket, address, manager):
     """Handles communication with a single client."""
     print(f'Connected to client {address}')
+    # Cap what the kernel may buffer for this client, and never block forever
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+    client_socket.settimeout(read_timeout)
+    reader = codec.FrameReader(client_socket, max_frame=max_frame_size, frame_timeout=frame_timeout)
+    last_activity = time.monotonic()
     try:
-        while True:
-            data = client_socket.recv(1024)
-            if not data:
+        compression = codec.accept_compression(client_socket, reader)
+        print(f'Client {address} uses compression: {compression.name if compression else "none"}')
+
+        while not manager.shutdown.is_set():
+            try:
+                frame = reader.read()
+            except socket.timeout:
+                if time.monotonic() - last_activity > idle_timeout:
+                    print(f'Client {address} idle for {idle_timeout}s, disconnecting')
+                    with manager.lock:
+                        manager.timed_out += 1
+                    break
+                continue
+
+            if frame is None:
                 print(f'Client {address} disconnected')
                 break
+            last_activity = time.monotonic()
+            message_codec, _, payload = frame
 
             try:
-                decoded_data = data.decode('utf-8')
-                print(f'Received message from {address}: {decoded_data}')
+                if message_codec is codec.UTF8:
+                    print(f'Received message from {address}: {message_codec.decode(payload)}')
+                else:
+                    print(f'Received {payload.nbytes} {message_codec.name} bytes from {address}')
 
                 # Simulate a time-consuming operation
                 print(f"Processing client {address} for 3 seconds...")
@@ -25,14 +156,28 @@ def handle_client(client_socket, address):
                 print(f"Finished processing client {address}")
 
 
-                sent_message = f'Server Received: {decoded_data}'
-                client_socket.sendall(sent_message.encode('utf-8'))
+                # Echo the payload straight out of the receive buffer, text
+                # and raw messages get the reply prefix sent in front of it
+                if message_codec is codec.STRUCT:
+                    pieces = [payload]
+                else:
+                    pieces = [response_prefix, payload]
+                codec.send_frame(client_socket, pieces, message_codec, compression)
                 print(f'Sent response to {address}')
+                last_activity = time.monotonic()
 
             except UnicodeDecodeError as e:
                 print(f'Error decoding data from {address}: {e}')
                 break
 
+    except codec.FrameError as e:
+        print(f'Bad frame from client {address}: {e}')
+
+    except (socket.timeout, codec.FrameTimeout) as e:
+        print(f'Client {address} timed out: {e}')
+        with manager.lock:
+            manager.timed_out += 1
+
     except socket.error as e:
         print(f'Socket error with client {address}: {e}')
 
@@ -45,26 +190,30 @@ def handle_client(client_socket, address):
 
 def main():
     """Main function to start the server and handle connections."""
+    manager = ConnectionManager()
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as Server:
             Server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             Server.bind((host, port))
 
             print(f'Server about to initialize a connection...')
-            Server.listen(5)
+            Server.listen(max_queued)
             print(f'Server waiting on {host}:{port}...')
+            manager.start()
 
             while True:
                 Client, address = Server.accept()
-                client_thread = threading.Thread(target=handle_client, args=(Client, address))
-                client_thread.start()
+                manager.admit(Client, address)
 
     except socket.error as e:
         print(f'Socket error: {e}')
     except KeyboardInterrupt:
-        print('Server shutting down.')
+        print(f'Server shutting down, draining connections {manager.stats()}')
     except Exception as e:
         print(f'An unexpected error occurred: {e}')
+    finally:
+        manager.drain()
+        print(f'Server stopped {manager.stats()}')
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,9 @@
+import os
 import socket
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
 
 
 Host = '127.0.0.1' # Local host
@@ -8,8 +13,12 @@ address_server = (Host, port)
 try:
     with socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM) as Client:
         # A client just has to send data
-        Client.sendto(message.encode('utf-8'), address_server)
-        Message_server = Client.recvfrom(1024)
-        print(f'The message form the server: {Message_server[0].decode('utf-8')}')
+        codec.send_frame(Client, [codec.UTF8.encode(message)], codec.UTF8, address=address_server)
+        buffer = bytearray(codec.MAX_DATAGRAM)
+        size, _ = Client.recvfrom_into(buffer)
+        message_codec, _, payload = codec.parse_frame(memoryview(buffer)[:size])
+        print(f'The message form the server: {message_codec.decode(payload)}')
 except socket.error as e:
     print(f'error occured: {e}.')
+except codec.FrameError as e:
+    print(f'The server sent a bad frame: {e}.')
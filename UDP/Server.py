@@ -1,11 +1,16 @@
+import os
 import socket 
+import sys
 import time
 import datetime
 
-server_message = f'Hello, This is the response from the server'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
+
+server_message = b' Hello, This is the response from the server'
 host  ='127.0.0.1' # Host of the server
 port = 9999     # Port of my server
-data_size = 1042
+data_size = codec.MAX_DATAGRAM
 try:
     with socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM) as Server:
         # Bind the host and associate it to this system, 
@@ -13,14 +18,22 @@ try:
         print(f'The Server is running at host:{host} and Port: {port}')
         ## Now we need to start listening
         ## The receiving function will return the IP ADDRESS of the client and the data
-        message, IP = Server.recvfrom(data_size)
-        print(f'Message from The client : {message.decode('utf-8')}')
+        ## Receive straight into a buffer we own and look at it through a memoryview
+        buffer = bytearray(data_size)
+        size, IP = Server.recvfrom_into(buffer)
+        message_codec, compression_id, message = codec.parse_frame(memoryview(buffer)[:size])
+        if message_codec is codec.UTF8:
+            print(f'Message from The client : {message_codec.decode(message)}')
+        else:
+            print(f'Message from The client : {message.nbytes} {message_codec.name} bytes')
         print(f'The IP Address of the Client is: {IP}')
         current_time = datetime.datetime.now()
         string_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-        server_message =f'{string_time} '+ server_message
-        print(f'The message the client is: {server_message}')
-        Server.sendto(server_message.encode('utf-8'), IP)
+        print(f'The message the client is: {string_time}{server_message.decode("utf-8")}')
+        # Answer with the compression the client used, the time and message go out as two pieces
+        compression = codec.COMPRESSIONS.get(compression_id)
+        codec.send_frame(Server, [string_time.encode('utf-8'), server_message], codec.UTF8, compression, address=IP)
 except socket.error as e:
     print(f'Error occured, Server shutting down ')
-
+except codec.FrameError as e:
+    print(f'Bad frame from the client: {e}, Server shutting down')
@@ -0,0 +1,316 @@
+"""
+Codec layer shared by the TCP and UDP labs.
+
+Every message travels as one frame: a 6 byte header (payload length, codec id,
+compression id) followed by the payload. Payloads are handed around as
+memoryviews so large binary messages are never copied just to be sent or
+received; decoding to text only happens when a script actually wants a string.
+
+Codecs:     raw (bytes passthrough), utf-8 text, and packed struct records.
+Compression: none, zlib, and lz4 when the lz4 package is installed. TCP peers
+agree on one per connection with a hello frame, UDP replies simply reuse the
+compression of the datagram they answer.
+
+The lab scripts are run directly from the TCP and UDP folders rather than as a
+package, so each one adds the folder above it to sys.path to import this module.
+"""
+
+import socket
+import struct
+import time
+import zlib
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+HEADER = struct.Struct('!IBB') # Payload length, codec id, compression id
+MAX_DATAGRAM = 65507 # Largest UDP payload over IPv4
+COMPRESS_THRESHOLD = 512 # Smaller payloads are not worth compressing
+
+
+class FrameError(ValueError):
+    """Raised for frames that are malformed, too large or use an unknown id."""
+
+
+class FrameTimeout(ConnectionError):
+    """Raised when a peer stops sending, or sends too slowly, part way through a frame."""
+
+
+class RawCodec:
+    """Bytes in, memoryview out, no conversion at all."""
+
+    id = 0
+    name = 'raw'
+
+    def encode(self, message):
+        return memoryview(message)
+
+    def decode(self, payload):
+        return payload
+
+
+class Utf8Codec:
+    """Text messages, encoded as UTF-8."""
+
+    id = 1
+    name = 'utf-8'
+
+    def encode(self, message):
+        return message.encode('utf-8')
+
+    def decode(self, payload):
+        return str(payload, 'utf-8')
+
+
+class StructCodec:
+    """Fixed-size binary records packed with a struct format both ends agree on."""
+
+    id = 2
+    name = 'struct'
+
+    def __init__(self, record_format='!Id'):
+        self.record = struct.Struct(record_format)
+
+    def encode(self, records):
+        records = list(records)
+        buffer = bytearray(self.record.size * len(records))
+        for i, record in enumerate(records):
+            self.record.pack_into(buffer, i * self.record.size, *record)
+        return buffer
+
+    def decode(self, payload):
+        return list(self.record.iter_unpack(payload))
+
+
+RAW = RawCodec()
+UTF8 = Utf8Codec()
+STRUCT = StructCodec()
+CODECS = {codec.id: codec for codec in (RAW, UTF8, STRUCT)}
+
+
+class ZlibCompression:
+    id = 1
+    name = 'zlib'
+
+    def compress(self, pieces):
+        compressor = zlib.compressobj()
+        chunks = [compressor.compress(piece) for piece in pieces]
+        chunks.append(compressor.flush())
+        return b''.join(chunks)
+
+    def decompress(self, payload, limit):
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(payload, limit)
+        except zlib.error as e:
+            raise FrameError(f'Corrupt zlib payload: {e}')
+        if decompressor.unconsumed_tail:
+            raise FrameError(f'Decompressed frame is larger than {limit} bytes')
+        if not decompressor.eof:
+            raise FrameError('Truncated zlib payload')
+        return data
+
+
+class Lz4Compression:
+    id = 2
+    name = 'lz4'
+
+    def compress(self, pieces):
+        compressor = lz4.frame.LZ4FrameCompressor()
+        chunks = [compressor.begin()]
+        chunks.extend(compressor.compress(piece) for piece in pieces)
+        chunks.append(compressor.flush())
+        return b''.join(chunks)
+
+    def decompress(self, payload, limit):
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        try:
+            data = decompressor.decompress(payload, max_length=limit)
+        except RuntimeError as e:
+            raise FrameError(f'Corrupt lz4 payload: {e}')
+        if not decompressor.eof:
+            if decompressor.needs_input:
+                raise FrameError('Truncated lz4 payload')
+            raise FrameError(f'Decompressed frame is larger than {limit} bytes')
+        return data
+
+
+COMPRESSIONS = {ZlibCompression.id: ZlibCompression()}
+if lz4 is not None:
+    COMPRESSIONS[Lz4Compression.id] = Lz4Compression()
+
+
+def compression_by_name(name):
+    """Look up a supported compression by name, None for 'none' or unknown names."""
+    for compression in COMPRESSIONS.values():
+        if compression.name == name:
+            return compression
+    return None
+
+
+def supported_compressions():
+    """Names of the compressions available here, most preferred first."""
+    return [c.name for c in sorted(COMPRESSIONS.values(), key=lambda c: -c.id)]
+
+
+def build_frame(pieces, codec, compression=None):
+    """Header plus payload buffers, ready for a scatter/gather send.
+
+    pieces are already-encoded bytes-like objects that together form the
+    payload; they are only joined when they have to be compressed.
+    """
+    pieces = [memoryview(piece).cast('B') for piece in pieces]
+    size = sum(piece.nbytes for piece in pieces)
+    compression_id = 0
+    if compression is not None and size >= COMPRESS_THRESHOLD:
+        compressed = compression.compress(pieces)
+        # Incompressible payloads go out as they are
+        if len(compressed) < size:
+            pieces = [memoryview(compressed)]
+            size = len(compressed)
+            compression_id = compression.id
+    return [HEADER.pack(size, codec.id, compression_id)] + pieces
+
+
+def send_frame(sock, pieces, codec, compression=None, address=None):
+    """Send one frame without first joining its pieces into a new buffer."""
+    buffers = build_frame(pieces, codec, compression)
+    if address is not None:
+        # A datagram has to go out in a single call
+        if hasattr(sock, 'sendmsg'):
+            sock.sendmsg(buffers, [], 0, address)
+        else:
+            sock.sendto(b''.join(buffers), address)
+        return
+    if not hasattr(sock, 'sendmsg'):
+        for buffer in buffers:
+            sock.sendall(buffer)
+        return
+    # sendmsg may send only part of the data, carry on from where it stopped
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers[0])
+            buffers.pop(0)
+        if buffers and sent:
+            buffers[0] = memoryview(buffers[0])[sent:]
+
+
+def _decompress(compression_id, payload, max_frame):
+    if compression_id == 0:
+        return payload
+    compression = COMPRESSIONS.get(compression_id)
+    if compression is None:
+        raise FrameError(f'Unsupported compression id {compression_id}')
+    return memoryview(compression.decompress(payload, max_frame))
+
+
+def parse_frame(view, max_frame=MAX_DATAGRAM):
+    """Split a datagram into (codec, compression_id, payload) without copying it."""
+    if len(view) < HEADER.size:
+        raise FrameError(f'Datagram of {len(view)} bytes is shorter than a header')
+    length, codec_id, compression_id = HEADER.unpack_from(view)
+    if length != len(view) - HEADER.size:
+        raise FrameError(f'Header says {length} bytes, datagram carries {len(view) - HEADER.size}')
+    codec = CODECS.get(codec_id)
+    if codec is None:
+        raise FrameError(f'Unknown codec id {codec_id}')
+    return codec, compression_id, _decompress(compression_id, view[HEADER.size:], max_frame)
+
+
+class FrameReader:
+    """Reads frames from a stream socket into one reusable buffer.
+
+    The payload returned by read() is a view into that buffer, so it is only
+    valid until the next call; copy it if it has to outlive the next frame.
+
+    frame_timeout bounds the whole frame from its first byte, so a peer that
+    trickles a byte at a time cannot hold the connection open indefinitely.
+    """
+
+    def __init__(self, sock, max_frame=1024 * 1024, frame_timeout=None):
+        self.sock = sock
+        self.max_frame = max_frame
+        self.frame_timeout = frame_timeout
+        self.deadline = None
+        self.header = bytearray(HEADER.size)
+        self.buffer = bytearray(4096)
+
+    def _recv_exact(self, view, started=False):
+        got = 0
+        while got < len(view):
+            try:
+                count = self.sock.recv_into(view[got:])
+            except socket.timeout:
+                if got == 0 and not started:
+                    raise
+                raise FrameTimeout('Peer stalled in the middle of a frame')
+            if count == 0:
+                if got == 0 and not started:
+                    return False
+                raise ConnectionError('Peer closed the connection mid-frame')
+            got += count
+            now = time.monotonic()
+            if self.deadline is None and self.frame_timeout is not None:
+                self.deadline = now + self.frame_timeout
+            if self.deadline is not None and now > self.deadline and got < len(view):
+                raise FrameTimeout(f'Peer took over {self.frame_timeout}s to send a frame')
+        return True
+
+    def read(self):
+        """Return (codec, compression_id, payload), or None when the peer closed.
+
+        A socket.timeout before any byte of a frame arrives is passed on so the
+        caller can decide whether the peer has been idle for too long.
+        """
+        self.deadline = None
+        if not self._recv_exact(memoryview(self.header)):
+            return None
+        length, codec_id, compression_id = HEADER.unpack(self.header)
+        if length > self.max_frame:
+            raise FrameError(f'Frame of {length} bytes exceeds the {self.max_frame} byte limit')
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            raise FrameError(f'Unknown codec id {codec_id}')
+        if length > len(self.buffer):
+            self.buffer = bytearray(min(self.max_frame, max(length, 2 * len(self.buffer))))
+        payload = memoryview(self.buffer)[:length]
+        self._recv_exact(payload, started=True)
+        return codec, compression_id, _decompress(compression_id, payload, self.max_frame)
+
+
+def _hello_text(payload):
+    """Compression names in a hello frame are plain ASCII."""
+    try:
+        return str(payload, 'ascii')
+    except UnicodeDecodeError:
+        raise FrameError('Malformed compression hello')
+
+
+def offer_compression(sock, reader):
+    """Client side of the hello exchange, returns the compression to use or None."""
+    offer = ','.join(supported_compressions()).encode('ascii')
+    send_frame(sock, [offer], RAW)
+    frame = reader.read()
+    if frame is None:
+        raise ConnectionError('Server closed the connection during the hello')
+    if frame[0] is UTF8:
+        # A text frame instead of an answer means the server turned us away
+        raise ConnectionError(f'Server refused the connection: {UTF8.decode(frame[2])}')
+    return compression_by_name(_hello_text(frame[2]))
+
+
+def accept_compression(sock, reader):
+    """Server side of the hello exchange, picks the first offered compression we have."""
+    frame = reader.read()
+    if frame is None:
+        raise ConnectionError('Client closed the connection during the hello')
+    chosen = None
+    for name in _hello_text(frame[2]).split(','):
+        chosen = compression_by_name(name)
+        if chosen is not None:
+            break
+    send_frame(sock, [chosen.name.encode('ascii') if chosen else b'none'], RAW)
+    return chosen